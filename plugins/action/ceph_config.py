@@ -0,0 +1,149 @@
+# Copyright Red Hat
+# SPDX-License-Identifier: Apache-2.0
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import datetime
+import shlex
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from ansible.plugins.action import ActionBase
+from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import build_base_cmd_shell, json_loads
+from ansible_collections.ceph.automation.plugins.module_utils.ceph_config_common import build_config_lookup, get_cache_path, get_config_changes, get_requested_options, \
+    CONFIG_ARGUMENT_SPEC, CONFIG_MUTUALLY_EXCLUSIVE, CONFIG_REQUIRED_ONE_OF, CONFIG_REQUIRED_TOGETHER
+
+
+# Print the time the dump was gathered followed by the output of `ceph config dump`
+# ("$@"), reusing the cache file of the module while it is fresh and refreshing it otherwise
+CACHED_CONFIG_DUMP_SCRIPT = '''
+cache_path=$1 cache_ttl=$2
+shift 2
+if mtime=$(stat -c %Y "$cache_path" 2>/dev/null) && [ $(($(date +%s) - mtime)) -lt "$cache_ttl" ]; then
+    echo "$mtime"
+    exec cat "$cache_path"
+fi
+now=$(date +%s)
+out=$("$@") || exit
+echo "$now"
+printf '%s\\n' "$out"
+mkdir -p -m 700 "$(dirname "$cache_path")" 2>/dev/null
+printf '%s' "$out" > "$cache_path.$$" 2>/dev/null && mv -f "$cache_path.$$" "$cache_path" 2>/dev/null
+exit 0
+'''
+
+
+class ActionModule(ActionBase):
+    '''
+    Check from the controller whether the options are already in the expected
+    state, the ceph_config module is only executed when something has to change.
+    '''
+
+    _supports_check_mode = True
+    _supports_async = True
+
+    @staticmethod
+    def _get_options(args: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        '''
+        Normalize the validated task arguments the way the module does,
+        return None when the check can't be done from the controller
+        '''
+        if args['action'] == 'get':
+            return None
+        options = get_requested_options(args)
+        if any(entry['action'] == 'set' and entry['value'] is None for entry in options):
+            return None
+        return options
+
+    def _get_config_dump(self, args: Dict[str, Any]) -> Tuple[List[str], Optional[List[Dict[str, Any]]], float]:
+        '''
+        Run `ceph config dump` on the host through a single low level command,
+        return the command, the dump (None on failure) and the time it was gathered
+        '''
+        cmd = []
+        # the ceph CLI can't be looked up on the host from here, if it is
+        # missing the command fails and the module falls back to `cephadm shell`.
+        # The cluster it talks to can't be checked either, so with an fsid
+        # go through `cephadm shell --fsid`
+        if not args['use_native_cli'] or args['fsid']:
+            # build the `cephadm shell` prefix without looking up the ceph CLI on the controller
+            cmd = build_base_cmd_shell(SimpleNamespace(params=dict(args, use_native_cli=False)))
+        cmd.extend(['ceph', 'config', 'dump', '--format', 'json'])
+
+        run_cmd = cmd
+        if args['cache_ttl']:
+            run_cmd = ['sh', '-c', CACHED_CONFIG_DUMP_SCRIPT, 'sh', get_cache_path(args), str(args['cache_ttl'])] + cmd
+        gathered_at = time.time()
+        res = self._low_level_execute_command(' '.join(shlex.quote(arg) for arg in run_cmd))
+        if res['rc'] != 0:
+            return cmd, None, gathered_at
+        out = res['stdout']
+        try:
+            if args['cache_ttl']:
+                timestamp, out = out.split('\n', 1)
+                gathered_at = float(timestamp)
+            return cmd, json_loads(out), gathered_at
+        except ValueError:
+            return cmd, None, gathered_at
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        startd = datetime.datetime.now()
+        # fails the task the same way the module would on invalid arguments
+        dummy, args = self.validate_argument_spec(CONFIG_ARGUMENT_SPEC,
+                                                  mutually_exclusive=CONFIG_MUTUALLY_EXCLUSIVE,
+                                                  required_one_of=CONFIG_REQUIRED_ONE_OF,
+                                                  required_together=CONFIG_REQUIRED_TOGETHER)
+        module_args = self._task.args
+        # an async task must return a job id, the module always runs then
+        options = None if self._task.async_val else self._get_options(args)
+        if options:
+            config_dump = args['cached_dump']
+            ansible_facts = None
+            cmd = []
+            if config_dump is None:
+                cmd, config_dump, gathered_at = self._get_config_dump(args)
+                ansible_facts = dict(ceph_config_dump=config_dump, ceph_config_dump_ts=gathered_at)
+            try:
+                config = build_config_lookup(config_dump) if config_dump is not None else None
+            except (KeyError, TypeError):
+                config = None
+
+            if config is not None:
+                # hand the dump over so the module doesn't query the cluster
+                # (or read a stale cache) again
+                module_args = dict(module_args, cached_dump=config_dump)
+                changes, messages = get_config_changes(options, config)
+                if not changes:
+                    endd = datetime.datetime.now()
+                    result.update(dict(
+                        cmd=cmd,
+                        start=str(startd),
+                        end=str(endd),
+                        delta=str(endd - startd),
+                        rc=0,
+                        stdout='\n'.join(messages),
+                        stdout_lines=messages,
+                        stderr='',
+                        changed=False
+                    ))
+                    if ansible_facts is not None:
+                        result['ansible_facts'] = ansible_facts
+                    return result
+
+        # something has to change or the check couldn't be done, let the module handle it
+        wrap_async = self._task.async_val and not self._connection.has_native_async
+        result.update(self._execute_module(module_name='ceph.automation.ceph_config',
+                                           module_args=module_args,
+                                           task_vars=task_vars,
+                                           wrap_async=wrap_async))
+
+        if not wrap_async:
+            # remove a temporary path we created
+            self._remove_tmp_path(self._connection._shell.tmpdir)
+
+        return result
@@ -2,9 +2,19 @@ from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
 import datetime
+import json
 import os
+import shlex
+import shutil
 import time
-from typing import TYPE_CHECKING, Any, List, Dict, Callable, Type, TypeVar, Optional
+from typing import TYPE_CHECKING, Any, List, Dict, Callable, Type, TypeVar, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    HAS_ORJSON = False
+else:
+    HAS_ORJSON = True
 
 if TYPE_CHECKING:
     from ansible.module_utils.basic import AnsibleModule  # type: ignore
@@ -134,9 +144,34 @@ def build_base_cmd(module: "AnsibleModule") -> List[str]:
     return cmd
 
 
+def get_local_fsid(conf_path: str = '/etc/ceph/ceph.conf') -> Optional[str]:
+    '''
+    Return the fsid of the cluster the ceph CLI installed on the host talks to
+    '''
+    section = None
+    try:
+        with open(conf_path) as f:
+            for line in f:
+                line = line.split('#', 1)[0].split(';', 1)[0].strip()
+                if line.startswith('['):
+                    section = line.strip('[]').strip()
+                elif section == 'global' and '=' in line:
+                    key, value = line.split('=', 1)
+                    if key.strip() == 'fsid':
+                        return value.strip()
+    except OSError:
+        pass
+    return None
+
+
 def build_base_cmd_shell(module: "AnsibleModule") -> List[str]:
-    cmd = build_base_cmd(module)
     fsid = module.params.get('fsid')
+    if module.params.get('use_native_cli') and shutil.which('ceph') and (not fsid or fsid == get_local_fsid()):
+        # the ceph CLI is installed on the host and talks to the requested
+        # cluster, no need to spawn a container
+        return []
+
+    cmd = build_base_cmd(module)
 
     cmd.append('shell')
 
@@ -153,13 +188,59 @@ def build_base_cmd_orch(module: "AnsibleModule") -> List[str]:
     return cmd
 
 
+def build_cmd_batch(base_cmd: List[str], cmds: List[List[str]]) -> List[str]:
+    '''
+    Build a command running all the given commands within a single `base_cmd` (e.g. `cephadm shell`)
+    '''
+    cmd = list(base_cmd)
+    if len(cmds) == 1:
+        cmd.extend(cmds[0])
+    else:
+        script = ' && '.join(' '.join(shlex.quote(arg) for arg in c) for c in cmds)
+        cmd.extend(['bash', '-c', script])
+
+    return cmd
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extract_json(data: str) -> str:
+    '''
+    Strip what the ceph CLI may print (warnings, ...) around a JSON document
+    '''
+    starts = [i for i in (data.find('['), data.find('{')) if i >= 0]
+    if not starts:
+        return data
+    return data[min(starts):max(data.rfind(']'), data.rfind('}')) + 1]
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    '''
+    Deserialize a JSON document, using orjson when it is available
+    '''
+    try:
+        return _json_loads(data)
+    except ValueError:
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        extracted = extract_json(data)
+        if extracted == data:
+            raise
+        return _json_loads(extracted)
+
+
 def exit_module(module: "AnsibleModule",
                 rc: int, cmd: List[str],
                 startd: datetime.datetime,
                 out: str = '',
                 err: str = '',
                 changed: bool = False,
-                diff: Optional[Dict[str, str]] = None) -> None:
+                diff: Optional[Dict[str, str]] = None,
+                ansible_facts: Optional[Dict[str, Any]] = None) -> None:
     endd = datetime.datetime.now()
     delta = endd - startd
 
@@ -174,6 +255,8 @@ def exit_module(module: "AnsibleModule",
         changed=changed,
         diff=diff
     )
+    if ansible_facts is not None:
+        result['ansible_facts'] = ansible_facts
     module.exit_json(**result)
 
 
@@ -0,0 +1,116 @@
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+# shared by the ceph_config module and action plugin
+CONFIG_ARGUMENT_SPEC = dict(
+    who=dict(type='str', required=False),
+    action=dict(type='str', required=False, choices=['get', 'set', 'remove'], default='set'),
+    option=dict(type='str', required=False),
+    value=dict(type='str', required=False),
+    options=dict(type='list', elements='dict', required=False,
+                 options=dict(
+                     who=dict(type='str', required=True),
+                     option=dict(type='str', required=True),
+                     value=dict(type='str', required=False),
+                     action=dict(type='str', required=False, choices=['set', 'remove'])
+                 )),
+    fsid=dict(type='str', required=False),
+    image=dict(type='str', required=False),
+    cache_ttl=dict(type='int', required=False, default=0),
+    cache_path=dict(type='path', required=False),
+    cached_dump=dict(type='list', elements='dict', required=False),
+    use_native_cli=dict(type='bool', required=False, default=False)
+)
+
+CONFIG_MUTUALLY_EXCLUSIVE = [['options', 'who'], ['options', 'option'], ['options', 'value']]
+CONFIG_REQUIRED_ONE_OF = [['options', 'who']]
+CONFIG_REQUIRED_TOGETHER = [['who', 'option']]
+
+
+def get_cache_path(params: Dict[str, Any]) -> str:
+    '''
+    Return the path of the file caching the output of `ceph config dump` on the host
+    '''
+    cache_path = params.get('cache_path')
+    if not cache_path:
+        fsid = params.get('fsid') or 'default'
+        cache_path = os.path.join('/run/ceph-automation', 'config_dump.{}.json'.format(fsid))
+    return cache_path
+
+
+def get_requested_options(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    '''
+    Return the options to set or remove, the entries of 'options' without
+    an action of their own use the top level one
+    '''
+    if params['options'] is None:
+        return [dict(who=params['who'], option=params['option'],
+                     value=params['value'], action=params['action'])]
+    return [dict(entry, action=entry['action'] or params['action']) for entry in params['options']]
+
+
+def build_config_lookup(config_dump: List[Dict[str, Any]]) -> Dict[Tuple[str, str], str]:
+    '''
+    Index the output of `ceph config dump` by (who, option)
+    '''
+    lookup = {}
+    for config in config_dump:
+        # masked options are reported as section 'osd' and mask 'host:foo'
+        who = config['section']
+        if config.get('mask'):
+            who = '{}/{}'.format(who, config['mask'])
+        lookup[(who, config['name'])] = config['value']
+    return lookup
+
+
+def _to_number(value: str) -> Optional[Union[int, float]]:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return None
+
+
+def config_value_matches(expected: str, current: Optional[str]) -> bool:
+    '''
+    Check whether the current value of an option is the expected one,
+    ignoring the case ('true' / 'True') and the number formatting ('3' / '3.0')
+    '''
+    if current is None:
+        return False
+    if expected.casefold() == current.casefold():
+        return True
+    expected_number = _to_number(expected)
+    return expected_number is not None and expected_number == _to_number(current)
+
+
+def get_config_changes(options: List[Dict[str, Any]],
+                       config: Dict[Tuple[str, str], str]) -> Tuple[List[List[str]], List[str]]:
+    '''
+    Compare the expected options with the current config and return
+    the `ceph config` sub-commands to run along with a message per option
+    '''
+    changes = []
+    messages = []
+    for entry in options:
+        current_value = config.get((entry['who'], entry['option']))
+
+        if entry['action'] == 'set':
+            if config_value_matches(entry['value'], current_value):
+                messages.append('who={} option={} value={} already set. Skipping.'.format(entry['who'], entry['option'], entry['value']))
+            else:
+                messages.append('who={} option={} would be set to {}'.format(entry['who'], entry['option'], entry['value']))
+                changes.append(['set', entry['who'], entry['option'], entry['value']])
+        else:
+            if current_value is None:
+                messages.append('who={} option={} already absent. Skipping.'.format(entry['who'], entry['option']))
+            else:
+                messages.append('who={} option={} would be removed'.format(entry['who'], entry['option']))
+                changes.append(['rm', entry['who'], entry['option']])
+
+    return changes, messages
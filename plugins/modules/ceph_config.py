@@ -21,6 +21,9 @@ short_description: set ceph config
 version_added: "1.1.0"
 description:
     - Set Ceph config options.
+    - For 'set' and 'remove', the current configuration is first checked from
+      the controller and the module is only executed on the host when a change
+      is required.
 options:
     fsid:
         description:
@@ -32,9 +35,20 @@ options:
             - The Ceph container image to use.
         type: str
         required: false
+    use_native_cli:
+        description:
+            - Call the ceph CLI installed on the host directly instead of
+              running it in a `cephadm shell` container.
+            - Falls back to `cephadm shell` when the ceph CLI is not found, or
+              when 'fsid' is set and differs from the fsid in /etc/ceph/ceph.conf.
+        type: bool
+        required: false
+        default: false
     action:
         description:
             - whether to get, set, or remove the parameter specified in 'option'
+            - with 'options', the action of the entries that don't set their own
+            - 'get' can't be used with 'options'
         type: str
         choices: ['get', 'set','remove']
         default: 'set'
@@ -42,18 +56,87 @@ options:
     who:
         description:
             - which daemon the configuration should be set to
+            - required unless 'options' is used
         type: str
-        required: true
+        required: false
     option:
         description:
             - name of the parameter to be set
+            - required unless 'options' is used
         type: str
-        required: true
+        required: false
     value:
         description:
             - value of the parameter
         type: str
         required: false
+    options:
+        description:
+            - list of options to set or remove in a single run
+            - the cluster configuration is fetched once and all the required
+              changes are applied with a single command
+            - mutually exclusive with 'who', 'option' and 'value'
+        type: list
+        elements: dict
+        required: false
+        suboptions:
+            who:
+                description:
+                    - which daemon the configuration should be set to
+                type: str
+                required: true
+            option:
+                description:
+                    - name of the parameter
+                type: str
+                required: true
+            value:
+                description:
+                    - value of the parameter
+                type: str
+                required: false
+            action:
+                description:
+                    - whether to set or remove the parameter
+                    - defaults to the top level 'action'
+                type: str
+                choices: ['set', 'remove']
+                required: false
+    cache_ttl:
+        description:
+            - number of seconds the output of `ceph config dump` is cached on
+              the host so subsequent runs can reuse it
+            - for 'set' and 'remove' it is also used by the check made from the
+              controller, which reads and refreshes the same file on the host
+            - the cache is invalidated as soon as an option is set or removed
+            - 0 disables the cache
+        type: int
+        default: 0
+        required: false
+    cache_path:
+        description:
+            - path of the file used to cache the output of `ceph config dump`
+            - defaults to /run/ceph-automation/config_dump.<fsid>.json
+        type: path
+        required: false
+    cached_dump:
+        description:
+            - output of a previous `ceph config dump`, as returned in the
+              'ceph_config_dump' fact, to use instead of querying the cluster
+            - it is up to the caller to make sure it is still accurate
+        type: list
+        elements: dict
+        required: false
+
+notes:
+    - When the module reads the whole `ceph config dump` and leaves it
+      unchanged, the dump is returned in the 'ceph_config_dump' fact along
+      with the time it was gathered in 'ceph_config_dump_ts', so it can be
+      passed to subsequent tasks with 'cached_dump' or kept in the fact cache.
+    - When the module sets or removes an option, 'ceph_config_dump' and
+      'ceph_config_dump_ts' are reset to null, so a stale dump is never passed
+      to subsequent tasks. A null 'cached_dump' makes the module query the
+      cluster again.
 
 author:
     - guillaume abrioux (@guits)
@@ -87,70 +170,143 @@ EXAMPLES = '''
     who: osd
     option: osd_memory_target
 
+- name: set several options at once
+  ceph_config:
+    options:
+      - who: osd
+        option: osd_memory_target
+        value: 5368709120
+      - who: global
+        option: osd_pool_default_size
+        value: 3
+      - who: mon
+        option: mon_allow_pool_delete
+        action: remove
+
+- name: remove several options at once
+  ceph_config:
+    action: remove
+    options:
+      - who: osd
+        option: osd_memory_target
+      - who: mon
+        option: mon_allow_pool_delete
+
+- name: set options in a loop, reusing the config dump between iterations
+  ceph_config:
+    who: "{{ item.who }}"
+    option: "{{ item.option }}"
+    value: "{{ item.value }}"
+    cache_ttl: 60
+  loop: "{{ ceph_options }}"
+
+- name: get the current configuration once
+  ceph_config:
+    action: get
+    who: global
+    option: fsid
+
+- name: set options without querying the cluster again
+  ceph_config:
+    who: "{{ item.who }}"
+    option: "{{ item.option }}"
+    value: "{{ item.value }}"
+    cached_dump: "{{ ceph_config_dump }}"
+  loop: "{{ ceph_options }}"
+
 '''
 
 RETURN = '''#  '''
 
-from typing import Any, Dict, List, Tuple, Union
+from typing import List, Tuple, Union
 from ansible.module_utils.basic import AnsibleModule  # type: ignore
 try:
-    from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import exit_module, build_base_cmd_shell, fatal  # type: ignore
+    from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import exit_module, build_base_cmd_shell, build_cmd_batch, fatal, json_loads  # type: ignore
+except ImportError:
+    from module_utils.ceph_common import exit_module, build_base_cmd_shell, build_cmd_batch, fatal, json_loads  # type: ignore
+try:
+    from ansible_collections.ceph.automation.plugins.module_utils.ceph_config_common import build_config_lookup, get_cache_path, get_config_changes, get_requested_options, \
+        CONFIG_ARGUMENT_SPEC, CONFIG_MUTUALLY_EXCLUSIVE, CONFIG_REQUIRED_ONE_OF, CONFIG_REQUIRED_TOGETHER  # type: ignore
 except ImportError:
-    from module_utils.ceph_common import exit_module, build_base_cmd_shell, fatal  # type: ignore
+    from module_utils.ceph_config_common import build_config_lookup, get_cache_path, get_config_changes, get_requested_options, \
+        CONFIG_ARGUMENT_SPEC, CONFIG_MUTUALLY_EXCLUSIVE, CONFIG_REQUIRED_ONE_OF, CONFIG_REQUIRED_TOGETHER  # type: ignore
 
 import datetime
-import json
+import os
+import time
 
 
-def set_option(module: "AnsibleModule",
-               who: str,
-               option: str,
-               value: str) -> Tuple[int, List[str], str, str]:
-    cmd = build_base_cmd_shell(module)
-    cmd.extend(['ceph', 'config', 'set', who, option, value])
+def build_config_cmd(change: List[str]) -> List[str]:
+    return ['ceph', 'config'] + change
 
-    rc, out, err = module.run_command(cmd)
 
-    return rc, cmd, out.strip(), err
-def remove_option(module: "AnsibleModule",
-                  who: str,
-                  option: str) -> Tuple[int, List[str], str, str]:
-    cmd = build_base_cmd_shell(module)
-    cmd.extend(['ceph', 'config', 'rm', who, option])
+def apply_changes(module: "AnsibleModule",
+                  base_cmd: List[str],
+                  changes: List[List[str]]) -> Tuple[int, List[str], str, str]:
+    """ apply all config changes with a single command """
+    cmd = build_cmd_batch(base_cmd, [build_config_cmd(change) for change in changes])
     rc, out, err = module.run_command(cmd)
+
     return rc, cmd, out.strip(), err
 
-  
 
-def get_config_dump(module: "AnsibleModule") -> Tuple[int, List[str], str, str]:
-    cmd = build_base_cmd_shell(module)
-    cmd.extend(['ceph', 'config', 'dump', '--format', 'json'])
+def read_cached_config_dump(cache_path: str, cache_ttl: int) -> Union[Tuple[str, float], None]:
+    """ return the cached config dump and the time it was gathered if it is still fresh """
+    try:
+        mtime = os.stat(cache_path).st_mtime
+        if mtime <= time.time() - cache_ttl:
+            return None
+        with open(cache_path) as f:
+            return f.read(), mtime
+    except OSError:
+        return None
+
+
+def write_cached_config_dump(cache_path: str, out: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        tmp_path = '{}.{}'.format(cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(out)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def invalidate_cached_config_dump(cache_path: str) -> None:
+    try:
+        os.unlink(cache_path)
+    except OSError:
+        pass
+
+
+def get_config_dump(module: "AnsibleModule", base_cmd: List[str]) -> Tuple[int, List[str], str, str, float]:
+    """ return the output of `ceph config dump` along with the time it was gathered """
+    cache_ttl = module.params.get('cache_ttl')
+    if cache_ttl:
+        cached = read_cached_config_dump(get_cache_path(module.params), cache_ttl)
+        if cached is not None:
+            out, mtime = cached
+            return 0, [], out, '', mtime
+
+    gathered_at = time.time()
+    cmd = base_cmd + ['ceph', 'config', 'dump', '--format', 'json']
     rc, out, err = module.run_command(cmd)
     if rc:
         fatal(message=f"Can't get current configuration via `ceph config dump`.Error:\n{err}", module=module)
     out = out.strip()
-    return rc, cmd, out, err
-
-
-def get_current_value(who: str, option: str, config_dump: List[Dict[str, Any]]) -> Union[str, None]:
-    for config in config_dump:
-        if config['section'] == who and config['name'] == option:
-            return config['value']
-    return None
+    if cache_ttl:
+        write_cached_config_dump(get_cache_path(module.params), out)
+    return rc, cmd, out, err, gathered_at
 
 
 def main() -> None:
     module = AnsibleModule(
-        argument_spec=dict(
-            who=dict(type='str', required=True),
-            action=dict(type='str', required=False, choices=['get', 'set','remove'], default='set'),
-            option=dict(type='str', required=True),
-            value=dict(type='str', required=False),
-            fsid=dict(type='str', required=False),
-            image=dict(type='str', required=False)
-        ),
+        argument_spec=CONFIG_ARGUMENT_SPEC,
         supports_check_mode=True,
-        required_if=[['action', 'set', ['value']]]
+        mutually_exclusive=CONFIG_MUTUALLY_EXCLUSIVE,
+        required_one_of=CONFIG_REQUIRED_ONE_OF,
+        required_together=CONFIG_REQUIRED_TOGETHER
     )
 
     # Gather module parameters in variables
@@ -158,49 +314,58 @@ def main() -> None:
     option = module.params.get('option')
     value = module.params.get('value')
     action = module.params.get('action')
+    options = module.params.get('options')
+
+    batch = options is not None
+    if batch and action == 'get':
+        module.fail_json(msg='action=get is not supported with options')
+    options = get_requested_options(module.params)
+    if action != 'get' and any(entry['action'] == 'set' and entry['value'] is None for entry in options):
+        module.fail_json(msg='action is set but all of the following are missing: value')
 
     startd = datetime.datetime.now()
     changed = False
+    base_cmd = build_base_cmd_shell(module)
+    ansible_facts = None
+    cached_dump = module.params.get('cached_dump')
 
-    rc, cmd, out, err = get_config_dump(module)
-    config_dump = json.loads(out)
-    current_value = get_current_value(who, option, config_dump)
-
-    if action == 'set':
-        if str(value).lower() == str(current_value).lower():
-            out = 'who={} option={} value={} already set. Skipping.'.format(who, option, value)
-        else:
-            if module.check_mode:
-                out = 'who={} option={} would be set to {}'.format(who, option, value)
-                changed = True
-            else:
-                rc, cmd, out, err = set_option(module, who, option, value)
-                if rc != 0:
-                    module.fail_json(msg=err, cmd=cmd, rc=rc)
-                changed = True
-
-    elif action == 'remove':
-        if current_value is None:
-            out = 'who={} option={} already absent. Skipping.'.format(who, option)
-        else:
-            if module.check_mode:
-                out = 'who={} option={} would be removed'.format(who, option)
-                changed = True
-            else:
-                rc, cmd, out, err = remove_option(module, who, option)
-                if rc != 0:
-                    module.fail_json(msg=err, cmd=cmd, rc=rc)
-                changed = True
+    if cached_dump is not None:
+        rc, cmd, err = 0, [], ''
+        config = build_config_lookup(cached_dump)
     else:
+        rc, cmd, out, err, gathered_at = get_config_dump(module, base_cmd)
+        config_dump = json_loads(out)
+        config = build_config_lookup(config_dump)
+        ansible_facts = dict(ceph_config_dump=config_dump, ceph_config_dump_ts=gathered_at)
+
+    if action == 'get' and not batch:
+        current_value = config.get((who, option))
         if current_value is None:
             out = ''
             err = 'No value found for who={} option={}'.format(who, option)
         else:
             out = current_value
+        exit_module(module=module, out=out, rc=rc,
+                    cmd=cmd, err=err, startd=startd,
+                    changed=changed, ansible_facts=ansible_facts)
+
+    changes, messages = get_config_changes(options, config)
+
+    out = '\n'.join(messages)
+    if changes:
+        changed = True
+        if not module.check_mode:
+            rc, cmd, out, err = apply_changes(module, base_cmd, changes)
+            invalidate_cached_config_dump(get_cache_path(module.params))
+            # the dump gathered before (here or by a previous task) no longer
+            # reflects the cluster configuration, reset it
+            ansible_facts = dict(ceph_config_dump=None, ceph_config_dump_ts=None)
+            if rc != 0:
+                module.fail_json(msg=err, cmd=cmd, rc=rc)
 
     exit_module(module=module, out=out, rc=rc,
                 cmd=cmd, err=err, startd=startd,
-                changed=changed)
+                changed=changed, ansible_facts=ansible_facts)
 
 
 if __name__ == '__main__':
@@ -33,8 +33,9 @@ short_description: apply service spec
 version_added: "1.0.0"
 description:
     - Manage and apply service specifications.
-    - This module is designed to apply a single service specification per execution.
-    - Multiple service specifications can be applied by using a loop.
+    - This module applies a single service specification per execution with 'spec'.
+    - Multiple service specifications can be applied by using a loop, or at once with 'specs'.
+    - Prefer 'specs' over a loop, the module is then transferred to the host and executed only once for all the specifications.
     - If any default key in the service specification is missing, the module will indicate a changed status.
     - To prevent unnecessary changes, ensure all keys with their default values are included in the service specification.
 options:
@@ -54,11 +55,32 @@ options:
         type: bool
         required: false
         default: false
+    use_native_cli:
+        description:
+            - Call the ceph CLI installed on the host directly instead of
+              running it in a `cephadm shell` container.
+            - Falls back to `cephadm shell` when the ceph CLI is not found, or
+              when 'fsid' is set and differs from the fsid in /etc/ceph/ceph.conf.
+        type: bool
+        required: false
+        default: false
     spec:
         description:
             - The service spec to apply
-        type: str
-        required: true
+            - Either a dict or a YAML string
+            - Mutually exclusive with 'specs'
+        type: raw
+        required: false
+    specs:
+        description:
+            - A list of service specs to apply
+            - Each spec is either a dict or a YAML string
+            - The current services are listed once and all the specs which
+              need to be applied are passed to a single `ceph orch apply`
+            - Mutually exclusive with 'spec'
+        type: list
+        elements: raw
+        required: false
 author:
     - Guillaume Abrioux (@guits)
 '''
@@ -86,65 +108,137 @@ EXAMPLES = '''
         frontend_port: 2049
         monitor_port: 9001
         virtual_ip: "172.16.20.11/24"
+
+- name: apply several specs at once
+  ceph.automation.ceph_orch_apply:
+    specs:
+      - service_type: "mds"
+        service_id: "cephfs"
+        placement:
+          count: 2
+      - service_type: "rgw"
+        service_id: "default"
+        placement:
+          label: "rgw"
 '''
 
 RETURN = '''#  '''
 
 import traceback
 from ansible.module_utils.basic import missing_required_lib
-try:
-    import yaml
-except ImportError:
-    HAS_ANOTHER_LIBRARY = False
-    ANOTHER_LIBRARY_IMPORT_ERROR = traceback.format_exc()
-else:
-    HAS_ANOTHER_LIBRARY = True
-    ANOTHER_LIBRARY_IMPORT_ERROR = None
 
-from typing import List, Tuple, Dict
+from typing import Any, List, Tuple, Dict, Union
 import datetime
+import json
 
 from ansible.module_utils.basic import AnsibleModule  # type: ignore
 try:
-    from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import exit_module, build_base_cmd_orch  # type: ignore
+    from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import exit_module, build_base_cmd_shell, build_cmd_batch, json_loads  # type: ignore
 except ImportError:
-    from module_utils.ceph_common import exit_module, build_base_cmd_orch
+    from module_utils.ceph_common import exit_module, build_base_cmd_shell, build_cmd_batch, json_loads
+
+
+# Key "service_id" is mandatory only for exact subset of services.
+# https://docs.ceph.com/en/latest/cephadm/services/#ceph.deployment.service_spec.ServiceSpec.service_id
+SERVICES_WITH_ID = frozenset(["iscsi", "nvmeof", "mds", "nfs", "osd", "rgw", "container", "ingress"])
+
+LISTING_SEPARATOR = '--- ceph_orch_apply listing ---'
 
+# PyYAML is imported on first use, see load_yaml()
+yaml = None
+SafeLoader = None
 
-def parse_spec(spec: str) -> Dict:
+
+def load_yaml(data: str) -> Any:
+    """ parse a YAML document, importing PyYAML on first use """
+    global yaml, SafeLoader
+    if yaml is None:
+        import yaml
+        # prefer the libyaml based loader when PyYAML was built with it
+        try:
+            from yaml import CSafeLoader as SafeLoader
+        except ImportError:
+            from yaml import SafeLoader  # type: ignore
+    return yaml.load(data, Loader=SafeLoader)
+
+
+def parse_spec(spec: Union[str, Dict]) -> Dict:
     """ parse spec string to yaml """
-    yaml_spec = yaml.safe_load(spec)
+    if isinstance(spec, dict):
+        # already parsed by Ansible from the playbook
+        return spec
+    yaml_spec = load_yaml(spec)
     return yaml_spec
 
 
-def retrieve_current_spec(module: AnsibleModule, expected_spec: Dict) -> Dict:
+def get_service_name(spec: Dict) -> str:
+    """ name under which `ceph orch ls` reports the service """
+    service: str = spec["service_type"]
+    if service in SERVICES_WITH_ID:
+        return "%s.%s" % (service, spec["service_id"])
+    return service
+
+
+def index_current_specs(out: str, key: str) -> Dict[str, Dict]:
+    """ index the result of a `ceph orch` listing by `key` """
+    # if there is no existing service, cephadm returns the string 'No services reported'
+    if 'No services reported' in out:
+        return {}
+    return {current_spec.get(key): current_spec for current_spec in json_loads(out)}
+
+
+def list_current_specs(module: AnsibleModule, cmd: List[str], key: str) -> Dict[str, Dict]:
+    """ run a `ceph orch` listing and index its result by `key` """
+    rc, out, err = module.run_command(cmd)
+    if rc != 0:
+        return {}
+    return index_current_specs(out, key)
+
+
+def retrieve_current_spec(module: AnsibleModule, base_cmd: List[str], expected_spec: Dict) -> Dict:
     """ retrieve current config of the service """
     service: str = expected_spec["service_type"]
-    # Key "service_id" is mandatory only for exact subset of services.
-    # https://docs.ceph.com/en/latest/cephadm/services/#ceph.deployment.service_spec.ServiceSpec.service_id
-    if service in ["iscsi", "nvmeof", "mds", "nfs", "osd", "rgw", "container", "ingress"]:
-        srv_name: str = "%s.%s" % (service, expected_spec["service_id"])
-    else:
-        srv_name: str = service
-    cmd = build_base_cmd_orch(module)
     # Hosts are not services but can be deployed with `ceph orch apply` like regular services.
     # And `ceph orch` has different syntax to list hosts.
     if service != "host":
-        cmd.extend(['ls', service, srv_name, '--format=yaml'])
-    else:
-        cmd.extend(['host', 'ls', '--host-pattern', expected_spec['hostname'], '--format=yaml'])
-    out = module.run_command(cmd)
-    if isinstance(out, str):
-        # if there is no existing service, cephadm returns the string 'No services reported'
-        return {}
-    else:
-        return yaml.safe_load(out[1])
+        srv_name = get_service_name(expected_spec)
+        cmd = base_cmd + ['ls', service, srv_name, '--format=json']
+        return list_current_specs(module, cmd, 'service_name').get(srv_name, {})
+    cmd = base_cmd + ['host', 'ls', '--host-pattern', expected_spec['hostname'], '--format=json']
+    return list_current_specs(module, cmd, 'hostname').get(expected_spec['hostname'], {})
+
+
+def retrieve_current_specs(module: AnsibleModule, shell_cmd: List[str], expected_specs: List[Dict]) -> List[Dict]:
+    """ retrieve current config of several services, listing services and hosts only once """
+    listings = []
+    if any(spec['service_type'] != 'host' for spec in expected_specs):
+        listings.append((['ceph', 'orch', 'ls', '--format=json'], 'service_name'))
+    if any(spec['service_type'] == 'host' for spec in expected_specs):
+        listings.append((['ceph', 'orch', 'host', 'ls', '--format=json'], 'hostname'))
+
+    # run both listings within a single `cephadm shell`, their outputs are told apart with a separator
+    cmds = []
+    for listing_cmd, key in listings:
+        if cmds:
+            cmds.append(['echo', LISTING_SEPARATOR])
+        cmds.append(listing_cmd)
+    rc, out, err = module.run_command(build_cmd_batch(shell_cmd, cmds))
+    outputs = out.split(LISTING_SEPARATOR)
+    current: Dict[str, Dict[str, Dict]] = {'service_name': {}, 'hostname': {}}
+    # a failed listing leaves the current specs empty, so the specs get applied
+    if rc == 0 and len(outputs) == len(listings):
+        for (listing_cmd, key), listing_out in zip(listings, outputs):
+            current[key] = index_current_specs(listing_out, key)
+
+    return [current['hostname'].get(spec['hostname'], {}) if spec['service_type'] == 'host'
+            else current['service_name'].get(get_service_name(spec), {})
+            for spec in expected_specs]
 
 
 def apply_spec(module: "AnsibleModule",
+               base_cmd: List[str],
                data: str) -> Tuple[int, List[str], str, str]:
-    cmd = build_base_cmd_orch(module)
-    cmd.extend(['apply', '-i', '-'])
+    cmd = base_cmd + ['apply', '-i', '-']
     rc, out, err = module.run_command(cmd, data=data)
 
     if rc:
@@ -162,42 +256,37 @@ def change_required(current: Dict, expected: Dict) -> bool:
     if expected['service_type'] == 'host':
         current['service_type'] = 'host'
 
-    for key, value in expected.items():
-        if key in current:
-            if current[key] != value:
-                return True
-            continue
-        else:
-            # "Location" key in the host spec is a one-time use key - it is not stored in the database.
-            # This key should not appear in the "current" spec, and it is safe to skip this key.
-            if key != 'location':
-                return True
-    return False
+    # Nested values (placement, spec, ...) are compared as a whole on purpose:
+    # a key removed from the expected spec must trigger a new apply.
+    # "Location" key in the host spec is a one-time use key - it is not stored in the database.
+    # This key should not appear in the "current" spec, and it is safe to skip this key.
+    return any(current[key] != value if key in current else key != 'location'
+               for key, value in expected.items())
 
 
 def run_module() -> None:
 
     module_args = dict(
-        spec=dict(type='str', required=True),
+        spec=dict(type='raw', required=False),
+        specs=dict(type='list', elements='raw', required=False),
         fsid=dict(type='str', required=False),
         docker=dict(type='bool',
                     required=False,
                     default=False),
-        image=dict(type='str', required=False)
+        image=dict(type='str', required=False),
+        use_native_cli=dict(type='bool', required=False, default=False)
     )
 
     module = AnsibleModule(
         argument_spec=module_args,
-        supports_check_mode=True
+        supports_check_mode=True,
+        mutually_exclusive=[['spec', 'specs']],
+        required_one_of=[['spec', 'specs']]
     )
 
-    if not HAS_ANOTHER_LIBRARY:
-        module.fail_json(
-            msg=missing_required_lib('another_library'),
-            exception=ANOTHER_LIBRARY_IMPORT_ERROR)
-
     startd = datetime.datetime.now()
     spec = module.params.get('spec')
+    specs = [spec] if spec is not None else module.params.get('specs')
 
     if module.check_mode:
         exit_module(
@@ -210,12 +299,34 @@ def run_module() -> None:
             changed=False
         )
 
+    shell_cmd = build_base_cmd_shell(module)
+    base_cmd = shell_cmd + ['ceph', 'orch']
+
     # Idempotency check
-    expected = parse_spec(module.params.get('spec'))
-    current_spec = retrieve_current_spec(module, expected)
+    try:
+        expected_specs = [parse_spec(s) for s in specs]
+    except ImportError:
+        module.fail_json(
+            msg=missing_required_lib('PyYAML'),
+            exception=traceback.format_exc())
+    if not all(isinstance(expected, dict) for expected in expected_specs):
+        module.fail_json(msg='spec must be a dict or a YAML mapping')
+
+    if spec is not None:
+        current_specs = [retrieve_current_spec(module, base_cmd, expected_specs[0])]
+    else:
+        current_specs = retrieve_current_specs(module, shell_cmd, expected_specs)
+
+    # JSON is valid YAML, no need to dump the specs with PyYAML
+    if spec is not None:
+        data = [json.dumps(spec) if isinstance(spec, dict) else spec]
+    else:
+        data = [json.dumps(expected) for expected in expected_specs]
+    data = [doc for doc, expected, current in zip(data, expected_specs, current_specs)
+            if change_required(current, expected)]
 
-    if change_required(current_spec, expected):
-        rc, cmd, out, err = apply_spec(module, spec)
+    if data:
+        rc, cmd, out, err = apply_spec(module, base_cmd, '\n---\n'.join(data))
         changed = True
     else:
         rc = 0
@@ -0,0 +1,201 @@
+from mock.mock import MagicMock, patch
+from ansible.errors import AnsibleActionFail
+from ansible.playbook.task import Task
+from ansible_collections.ceph.automation.plugins.action.ceph_config import ActionModule, CACHED_CONFIG_DUMP_SCRIPT
+import json
+import pytest
+import subprocess
+
+fake_config_dump = [
+    {'section': 'global', 'name': 'osd_pool_default_size', 'value': '3'},
+    {'section': 'osd', 'name': 'osd_memory_target', 'value': '4294967296'},
+    {'section': 'mon', 'name': 'mon_allow_pool_delete', 'value': 'true'},
+]
+fake_module_result = dict(changed=True, rc=0, stdout='', stderr='')
+
+
+def get_action(args):
+    task = MagicMock(Task)
+    task.args = args
+    task.async_val = 0
+    task.check_mode = False
+    action = ActionModule(task, MagicMock(), MagicMock(), loader=None, templar=None, shared_loader_obj=None)
+    action._low_level_execute_command = MagicMock(return_value=dict(rc=0, stdout=json.dumps(fake_config_dump), stderr=''))
+    action._execute_module = MagicMock(return_value=dict(fake_module_result))
+    action._remove_tmp_path = MagicMock()
+    return action
+
+
+class TestCephConfigAction(object):
+
+    def test_no_change(self):
+        action = get_action(dict(who='osd', option='osd_memory_target', value=4294967296))
+        result = action.run(task_vars={})
+
+        action._low_level_execute_command.assert_called_once_with('cephadm shell ceph config dump --format json')
+        action._execute_module.assert_not_called()
+        assert not result['changed']
+        assert result['rc'] == 0
+        assert result['stdout'] == 'who=osd option=osd_memory_target value=4294967296 already set. Skipping.'
+        assert result['ansible_facts']['ceph_config_dump'] == fake_config_dump
+
+    def test_no_change_options(self):
+        options = [
+            dict(who='global', option='osd_pool_default_size', value='3'),
+            dict(who='mon', option='mon_max_pg_per_osd', action='remove'),
+        ]
+        action = get_action(dict(options=options, fsid='123', image='quay.io/ceph/ceph:v18'))
+        result = action.run(task_vars={})
+
+        action._low_level_execute_command.assert_called_once_with('cephadm --image quay.io/ceph/ceph:v18 shell --fsid 123 ceph config dump --format json')
+        action._execute_module.assert_not_called()
+        assert not result['changed']
+        assert result['stdout_lines'] == [
+            'who=global option=osd_pool_default_size value=3 already set. Skipping.',
+            'who=mon option=mon_max_pg_per_osd already absent. Skipping.',
+        ]
+
+    def test_no_change_options_default_action(self):
+        options = [
+            dict(who='mon', option='mon_max_pg_per_osd'),
+            dict(who='global', option='osd_pool_default_size', value='3', action='set'),
+        ]
+        action = get_action(dict(action='remove', options=options))
+        result = action.run(task_vars={})
+
+        action._execute_module.assert_not_called()
+        assert not result['changed']
+        assert result['stdout_lines'] == [
+            'who=mon option=mon_max_pg_per_osd already absent. Skipping.',
+            'who=global option=osd_pool_default_size value=3 already set. Skipping.',
+        ]
+
+    def test_native_cli(self):
+        action = get_action(dict(who='osd', option='osd_memory_target', value='4294967296', use_native_cli=True))
+        action.run(task_vars={})
+
+        action._low_level_execute_command.assert_called_once_with('ceph config dump --format json')
+
+    def test_native_cli_with_fsid(self):
+        action = get_action(dict(who='osd', option='osd_memory_target', value='4294967296', use_native_cli=True, fsid='123'))
+        action.run(task_vars={})
+
+        action._low_level_execute_command.assert_called_once_with('cephadm shell --fsid 123 ceph config dump --format json')
+
+    @patch('shutil.which', return_value='/usr/bin/ceph')
+    def test_native_cli_not_looked_up_on_controller(self, m_which):
+        action = get_action(dict(who='osd', option='osd_memory_target', value='4294967296', use_native_cli='no'))
+        action.run(task_vars={})
+
+        m_which.assert_not_called()
+        action._low_level_execute_command.assert_called_once_with('cephadm shell ceph config dump --format json')
+
+    def test_cache_ttl(self):
+        action = get_action(dict(who='osd', option='osd_memory_target', value='4294967296',
+                                 cache_ttl=60, cache_path='/run/ceph-automation/dump.json'))
+        action._low_level_execute_command.return_value = dict(rc=0, stdout='1700000000\n' + json.dumps(fake_config_dump), stderr='')
+        result = action.run(task_vars={})
+
+        cmd = action._low_level_execute_command.call_args.args[0]
+        assert cmd.startswith('sh -c ')
+        assert cmd.endswith(' sh /run/ceph-automation/dump.json 60 cephadm shell ceph config dump --format json')
+        action._execute_module.assert_not_called()
+        assert not result['changed']
+        assert result['ansible_facts']['ceph_config_dump'] == fake_config_dump
+        assert result['ansible_facts']['ceph_config_dump_ts'] == 1700000000
+
+    def test_cached_config_dump_script(self, tmp_path):
+        cache_path = tmp_path / 'cache' / 'dump.json'
+        dump = json.dumps(fake_config_dump)
+        script = ['sh', '-c', CACHED_CONFIG_DUMP_SCRIPT, 'sh', str(cache_path), '60']
+
+        # a failed query isn't cached
+        res = subprocess.run(script + ['false'], capture_output=True, text=True)
+        assert res.returncode != 0
+        assert not cache_path.exists()
+
+        res = subprocess.run(script + ['echo', dump], capture_output=True, text=True)
+        assert res.returncode == 0
+        assert json.loads(res.stdout.split('\n', 1)[1]) == fake_config_dump
+        assert cache_path.read_text() == dump
+
+        # served from the cache, dated with its mtime
+        res = subprocess.run(script + ['false'], capture_output=True, text=True)
+        assert res.returncode == 0
+        assert res.stdout == '{}\n{}'.format(int(cache_path.stat().st_mtime), dump)
+
+    def test_cached_dump(self):
+        action = get_action(dict(who='mon', option='mon_allow_pool_delete', value='true', cached_dump=fake_config_dump))
+        result = action.run(task_vars={})
+
+        action._low_level_execute_command.assert_not_called()
+        action._execute_module.assert_not_called()
+        assert not result['changed']
+        assert 'ansible_facts' not in result
+
+    def test_change_passes_dump(self):
+        args = dict(who='osd', option='osd_memory_target', value='5368709120')
+        action = get_action(args)
+        result = action.run(task_vars={})
+
+        action._execute_module.assert_called_once()
+        module_args = action._execute_module.call_args.kwargs['module_args']
+        assert module_args == dict(args, cached_dump=fake_config_dump)
+        assert result['changed']
+        action._remove_tmp_path.assert_called_once_with(action._connection._shell.tmpdir)
+
+    @pytest.mark.parametrize('res', [
+        dict(rc=1, stdout='', stderr='error'),
+        dict(rc=0, stdout='not json', stderr=''),
+        dict(rc=0, stdout=json.dumps([{'name': 'osd_memory_target'}]), stderr=''),
+    ])
+    def test_dump_failure_falls_back_to_module(self, res):
+        args = dict(who='osd', option='osd_memory_target', value='4294967296')
+        action = get_action(args)
+        action._low_level_execute_command.return_value = res
+        action.run(task_vars={})
+
+        action._execute_module.assert_called_once()
+        assert action._execute_module.call_args.kwargs['module_args'] == args
+
+    @pytest.mark.parametrize('args', [
+        dict(action='get', who='global', option='osd_pool_default_size'),
+        dict(action='set', who='global', option='osd_pool_default_size'),
+        dict(action='get', options=[dict(who='global', option='osd_pool_default_size', value='3')]),
+        dict(options=[dict(who='global', option='osd_pool_default_size')]),
+    ])
+    def test_delegates_to_module(self, args):
+        action = get_action(args)
+        action.run(task_vars={})
+
+        action._low_level_execute_command.assert_not_called()
+        action._execute_module.assert_called_once()
+        assert action._execute_module.call_args.kwargs['module_args'] == args
+
+    def test_async(self):
+        args = dict(who='osd', option='osd_memory_target', value='4294967296')
+        action = get_action(args)
+        action._task.async_val = 30
+        action._connection.has_native_async = False
+        action._execute_module.return_value = dict(ansible_job_id='1234.5678', started=1, finished=0)
+        result = action.run(task_vars={})
+
+        action._low_level_execute_command.assert_not_called()
+        action._execute_module.assert_called_once()
+        assert action._execute_module.call_args.kwargs['module_args'] == args
+        assert action._execute_module.call_args.kwargs['wrap_async']
+        assert result['ansible_job_id'] == '1234.5678'
+        action._remove_tmp_path.assert_not_called()
+
+    @pytest.mark.parametrize('args', [
+        dict(options=[dict(who='global', option='osd_pool_default_size', value='3')], who='osd'),
+        dict(who='osd', value='3'),
+        dict(who='osd', option='osd_memory_target', value='1', foo='bar'),
+    ])
+    def test_invalid_args(self, args):
+        action = get_action(args)
+        with pytest.raises(AnsibleActionFail):
+            action.run(task_vars={})
+
+        action._low_level_execute_command.assert_not_called()
+        action._execute_module.assert_not_called()
@@ -1,6 +1,6 @@
-from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import build_base_cmd_orch, fatal
+from ansible_collections.ceph.automation.plugins.module_utils.ceph_common import build_base_cmd_orch, build_base_cmd_shell, build_cmd_batch, extract_json, fatal, get_local_fsid, json_loads
 import pytest
-from mock.mock import MagicMock
+from mock.mock import MagicMock, patch
 
 
 class TestCephCommon(object):
@@ -32,6 +32,67 @@ class TestCephCommon(object):
         cmd = build_base_cmd_orch(self.fake_module)
         assert cmd == expected_cmd
 
+    @patch('ansible_collections.ceph.automation.plugins.module_utils.ceph_common.get_local_fsid', return_value='123')
+    @patch('shutil.which', return_value='/usr/bin/ceph')
+    def test_build_base_cmd_orch_native_cli(self, m_which, m_get_local_fsid):
+        expected_cmd = ['ceph', 'orch']
+        self.fake_module.params = {'use_native_cli': True, 'fsid': '123'}
+        cmd = build_base_cmd_orch(self.fake_module)
+        assert cmd == expected_cmd
+
+    @patch('ansible_collections.ceph.automation.plugins.module_utils.ceph_common.get_local_fsid', return_value='456')
+    @patch('shutil.which', return_value='/usr/bin/ceph')
+    def test_build_base_cmd_orch_native_cli_other_fsid(self, m_which, m_get_local_fsid):
+        expected_cmd = ['cephadm', 'shell', '--fsid', '123', 'ceph', 'orch']
+        self.fake_module.params = {'use_native_cli': True, 'fsid': '123'}
+        cmd = build_base_cmd_orch(self.fake_module)
+        assert cmd == expected_cmd
+
+    @patch('shutil.which', return_value='/usr/bin/ceph')
+    def test_build_base_cmd_orch_native_cli_no_fsid(self, m_which):
+        expected_cmd = ['ceph', 'orch']
+        self.fake_module.params = {'use_native_cli': True}
+        cmd = build_base_cmd_orch(self.fake_module)
+        assert cmd == expected_cmd
+
+    def test_get_local_fsid(self, tmp_path):
+        conf_path = tmp_path / 'ceph.conf'
+        conf_path.write_text('# minimal ceph.conf\n[global]\n\tfsid = 123  # comment\n\tmon_host = [v2:10.0.0.1:3300/0]\n')
+        assert get_local_fsid(str(conf_path)) == '123'
+        assert get_local_fsid(str(tmp_path / 'missing.conf')) is None
+
+    @patch('shutil.which', return_value=None)
+    def test_build_base_cmd_orch_native_cli_missing(self, m_which):
+        expected_cmd = ['cephadm', 'shell', '--fsid', '123', 'ceph', 'orch']
+        self.fake_module.params = {'use_native_cli': True, 'fsid': '123'}
+        cmd = build_base_cmd_orch(self.fake_module)
+        assert cmd == expected_cmd
+
+    def test_build_cmd_batch_single_cmd(self):
+        expected_cmd = ['cephadm', 'shell', '--fsid', '123', 'ceph', 'config', 'set', 'osd', 'debug_osd', '20']
+        self.fake_module.params = {'fsid': '123'}
+        cmd = build_cmd_batch(build_base_cmd_shell(self.fake_module), [['ceph', 'config', 'set', 'osd', 'debug_osd', '20']])
+        assert cmd == expected_cmd
+
+    def test_build_cmd_batch_multiple_cmds(self):
+        expected_cmd = ['cephadm', 'shell', 'bash', '-c',
+                        "ceph config set osd/host:node1 debug_osd '1 5' && ceph config rm mon debug_mon"]
+        cmd = build_cmd_batch(build_base_cmd_shell(self.fake_module), [['ceph', 'config', 'set', 'osd/host:node1', 'debug_osd', '1 5'],
+                                                                       ['ceph', 'config', 'rm', 'mon', 'debug_mon']])
+        assert cmd == expected_cmd
+
+    def test_json_loads(self):
+        assert json_loads('[{"section": "osd", "name": "osd_memory_target"}]') == [{'section': 'osd', 'name': 'osd_memory_target'}]
+        assert json_loads(b'{"osd_memory_target": "4294967296"}') == {'osd_memory_target': '4294967296'}
+        with pytest.raises(ValueError):
+            json_loads('No services reported')
+
+    def test_json_loads_with_noise(self):
+        out = 'WARNING: the cluster is in degraded state\n[{"section": "osd"}]\n2 warnings\n'
+        assert extract_json(out) == '[{"section": "osd"}]'
+        assert json_loads(out) == [{'section': 'osd'}]
+        assert json_loads(out.encode()) == [{'section': 'osd'}]
+
     def test_fatal(self):
         fatal("error", self.fake_module)
         self.fake_module.fail_json.assert_called_with(msg='error', rc=1)
@@ -0,0 +1,62 @@
+from ansible_collections.ceph.automation.plugins.module_utils.ceph_config_common import build_config_lookup, config_value_matches, get_config_changes, get_requested_options
+
+
+class TestCephConfigCommon(object):
+    def setup_method(self):
+        self.config = build_config_lookup([
+            {'section': 'osd', 'name': 'osd_memory_target', 'value': '4294967296', 'mask': ''},
+            {'section': 'osd', 'name': 'osd_memory_target', 'value': '5368709120', 'mask': 'host:ceph-osd-02'},
+            {'section': 'mon', 'name': 'mon_allow_pool_delete', 'value': 'true'},
+        ])
+
+    def test_build_config_lookup(self):
+        assert self.config == {
+            ('osd', 'osd_memory_target'): '4294967296',
+            ('osd/host:ceph-osd-02', 'osd_memory_target'): '5368709120',
+            ('mon', 'mon_allow_pool_delete'): 'true',
+        }
+
+    def test_get_config_changes_no_change(self):
+        options = [
+            {'who': 'osd/host:ceph-osd-02', 'option': 'osd_memory_target', 'value': '5368709120', 'action': 'set'},
+            {'who': 'mon', 'option': 'mon_allow_pool_delete', 'value': 'True', 'action': 'set'},
+            {'who': 'mon', 'option': 'mon_max_pg_per_osd', 'value': None, 'action': 'remove'},
+        ]
+        changes, messages = get_config_changes(options, self.config)
+        assert changes == []
+        assert len(messages) == 3
+
+    def test_get_config_changes(self):
+        options = [
+            {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120', 'action': 'set'},
+            {'who': 'mon', 'option': 'mon_allow_pool_delete', 'value': None, 'action': 'remove'},
+        ]
+        changes, messages = get_config_changes(options, self.config)
+        assert changes == [['set', 'osd', 'osd_memory_target', '5368709120'],
+                           ['rm', 'mon', 'mon_allow_pool_delete']]
+        assert messages == ['who=osd option=osd_memory_target would be set to 5368709120',
+                            'who=mon option=mon_allow_pool_delete would be removed']
+
+    def test_config_value_matches(self):
+        assert config_value_matches('True', 'true')
+        assert config_value_matches('3', '3.000000')
+        assert config_value_matches('9007199254740993', '9007199254740993')
+        assert not config_value_matches('9007199254740993', '9007199254740992')
+        assert not config_value_matches('4294967296', '5368709120')
+        assert not config_value_matches('none', None)
+        assert not config_value_matches('0', 'false')
+
+    def test_get_requested_options(self):
+        params = {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120', 'action': 'set', 'options': None}
+        assert get_requested_options(params) == [
+            {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120', 'action': 'set'},
+        ]
+
+        params = {'who': None, 'option': None, 'value': None, 'action': 'remove', 'options': [
+            {'who': 'osd', 'option': 'osd_memory_target', 'value': None, 'action': None},
+            {'who': 'global', 'option': 'osd_pool_default_size', 'value': '3', 'action': 'set'},
+        ]}
+        assert get_requested_options(params) == [
+            {'who': 'osd', 'option': 'osd_memory_target', 'value': None, 'action': 'remove'},
+            {'who': 'global', 'option': 'osd_pool_default_size', 'value': '3', 'action': 'set'},
+        ]
@@ -0,0 +1,391 @@
+from mock.mock import patch
+import json
+import os
+import pytest
+from ansible_collections.ceph.automation.tests.unit.modules import ca_test_common
+from ansible_collections.ceph.automation.plugins.modules import ceph_config
+
+fake_config_dump = json.dumps([
+    {'section': 'global', 'name': 'osd_pool_default_size', 'value': '3'},
+    {'section': 'osd', 'name': 'osd_memory_target', 'value': '4294967296'},
+    {'section': 'mon', 'name': 'mon_allow_pool_delete', 'value': 'true'},
+])
+fake_dump_cmd = ['cephadm', 'shell', 'ceph', 'config', 'dump', '--format', 'json']
+
+
+class TestCephConfigModule(object):
+
+    @patch('ansible.module_utils.basic.AnsibleModule.fail_json')
+    def test_without_parameters(self, m_fail_json):
+        ca_test_common.set_module_args({})
+        m_fail_json.side_effect = ca_test_common.fail_json
+
+        with pytest.raises(ca_test_common.AnsibleFailJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['msg'] == 'one of the following is required: options, who'
+
+    @patch('ansible.module_utils.basic.AnsibleModule.fail_json')
+    def test_set_without_value(self, m_fail_json):
+        ca_test_common.set_module_args({
+            'who': 'osd',
+            'option': 'osd_memory_target'
+        })
+        m_fail_json.side_effect = ca_test_common.fail_json
+
+        with pytest.raises(ca_test_common.AnsibleFailJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['msg'] == 'action is set but all of the following are missing: value'
+
+    @patch('ansible.module_utils.basic.AnsibleModule.fail_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_options_without_value(self, m_run_command, m_fail_json):
+        ca_test_common.set_module_args({
+            'options': [
+                {'who': 'osd', 'option': 'osd_memory_target', 'action': 'remove'},
+                {'who': 'mon', 'option': 'mon_allow_pool_delete'},
+            ]
+        })
+        m_fail_json.side_effect = ca_test_common.fail_json
+
+        with pytest.raises(ca_test_common.AnsibleFailJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['msg'] == 'action is set but all of the following are missing: value'
+        assert not m_run_command.called
+
+    @patch('ansible.module_utils.basic.AnsibleModule.fail_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_get_with_options(self, m_run_command, m_fail_json):
+        ca_test_common.set_module_args({
+            'action': 'get',
+            'options': [{'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120'}]
+        })
+        m_fail_json.side_effect = ca_test_common.fail_json
+
+        with pytest.raises(ca_test_common.AnsibleFailJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['msg'] == 'action=get is not supported with options'
+        assert not m_run_command.called
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_get_option(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'action': 'get',
+            'who': 'global',
+            'option': 'osd_pool_default_size'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert result['cmd'] == fake_dump_cmd
+        assert result['stdout'] == '3'
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_option_already_set(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'who': 'osd',
+            'option': 'osd_memory_target',
+            'value': '4294967296'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert result['cmd'] == fake_dump_cmd
+        assert result['stdout'] == 'who=osd option=osd_memory_target value=4294967296 already set. Skipping.'
+        assert m_run_command.call_count == 1
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_option_inherited(self, m_run_command, m_exit_json):
+        # osd.0 inherits the value from the 'osd' section, it must still be set on osd.0
+        ca_test_common.set_module_args({
+            'who': 'osd.0',
+            'option': 'osd_memory_target',
+            'value': '4294967296'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == ['cephadm', 'shell', 'ceph', 'config', 'set', 'osd.0', 'osd_memory_target', '4294967296']
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_option(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'who': 'osd',
+            'option': 'osd_memory_target',
+            'value': '5368709120'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == ['cephadm', 'shell', 'ceph', 'config', 'set', 'osd', 'osd_memory_target', '5368709120']
+        assert result['rc'] == 0
+        assert result['ansible_facts'] == dict(ceph_config_dump=None, ceph_config_dump_ts=None)
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_option_with_mask(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'who': 'osd/host:ceph-osd-02',
+            'option': 'osd_memory_target',
+            'value': '5368709120'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert m_run_command.call_args_list[0].args[0] == fake_dump_cmd
+        assert result['cmd'] == ['cephadm', 'shell', 'ceph', 'config', 'set', 'osd/host:ceph-osd-02', 'osd_memory_target', '5368709120']
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_remove_option_already_absent(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'action': 'remove',
+            'who': 'osd.0',
+            'option': 'osd_memory_target'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert result['stdout'] == 'who=osd.0 option=osd_memory_target already absent. Skipping.'
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_batch_options(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'options': [
+                {'who': 'global', 'option': 'osd_pool_default_size', 'value': '3'},
+                {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120'},
+                {'who': 'mon', 'option': 'mon_allow_pool_delete', 'action': 'remove'},
+            ]
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == ['cephadm', 'shell', 'bash', '-c',
+                                 'ceph config set osd osd_memory_target 5368709120 && '
+                                 'ceph config rm mon mon_allow_pool_delete']
+        assert m_run_command.call_count == 2
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_batch_options_default_action(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'action': 'remove',
+            'options': [
+                {'who': 'osd', 'option': 'osd_memory_target'},
+                {'who': 'mon', 'option': 'mon_allow_pool_delete'},
+                {'who': 'global', 'option': 'osd_pool_default_size', 'value': '2', 'action': 'set'},
+            ]
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == ['cephadm', 'shell', 'bash', '-c',
+                                 'ceph config rm osd osd_memory_target && '
+                                 'ceph config rm mon mon_allow_pool_delete && '
+                                 'ceph config set global osd_pool_default_size 2']
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_batch_options_check_mode(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'options': [
+                {'who': 'global', 'option': 'osd_pool_default_size', 'value': '3'},
+                {'who': 'osd/host:ceph-osd-02', 'option': 'osd_memory_target', 'value': '5368709120'},
+            ],
+            '_ansible_check_mode': True
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['stdout'] == ('who=global option=osd_pool_default_size value=3 already set. Skipping.\n'
+                                    'who=osd/host:ceph-osd-02 option=osd_memory_target would be set to 5368709120')
+        assert m_run_command.call_count == 1
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_config_dump_cache(self, m_run_command, m_exit_json, tmp_path):
+        cache_path = str(tmp_path / 'config_dump.json')
+        ca_test_common.set_module_args({
+            'action': 'get',
+            'who': 'global',
+            'option': 'osd_pool_default_size',
+            'cache_ttl': 60,
+            'cache_path': cache_path
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        for _ in range(2):
+            with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+                ceph_config.main()
+            assert result.value.args[0]['stdout'] == '3'
+
+        assert m_run_command.call_count == 1
+        assert (tmp_path / 'config_dump.json').read_text() == fake_config_dump
+        # the dump served from the cache is dated by the cache file
+        assert result.value.args[0]['ansible_facts']['ceph_config_dump_ts'] == os.stat(cache_path).st_mtime
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_config_dump_cache_invalidated_on_change(self, m_run_command, m_exit_json, tmp_path):
+        cache_path = tmp_path / 'config_dump.json'
+        cache_path.write_text(fake_config_dump)
+        ca_test_common.set_module_args({
+            'who': 'osd/host:ceph-osd-02',
+            'option': 'osd_memory_target',
+            'value': '5368709120',
+            'cache_ttl': 60,
+            'cache_path': str(cache_path)
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, '', ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert m_run_command.call_count == 1
+        assert not cache_path.exists()
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_set_option_with_mask_already_set(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'who': 'osd/host:ceph-osd-02',
+            'option': 'osd_memory_target',
+            'value': '5368709120'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        config_dump = json.dumps([
+            {'section': 'osd', 'name': 'osd_memory_target', 'value': '4294967296', 'mask': ''},
+            {'section': 'osd', 'name': 'osd_memory_target', 'value': '5368709120', 'mask': 'host:ceph-osd-02'},
+        ])
+        m_run_command.return_value = 0, config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert m_run_command.call_count == 1
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_config_dump_facts(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'action': 'get',
+            'who': 'global',
+            'option': 'osd_pool_default_size'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, fake_config_dump, ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['ansible_facts']['ceph_config_dump'] == json.loads(fake_config_dump)
+        assert 'ceph_config_dump_ts' in result['ansible_facts']
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_cached_dump(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'options': [
+                {'who': 'global', 'option': 'osd_pool_default_size', 'value': '3'},
+                {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120'},
+            ],
+            'cached_dump': json.loads(fake_config_dump)
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, '', ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == ['cephadm', 'shell', 'ceph', 'config', 'set', 'osd', 'osd_memory_target', '5368709120']
+        assert m_run_command.call_count == 1
+        assert result['ansible_facts'] == dict(ceph_config_dump=None, ceph_config_dump_ts=None)
+
+    @patch('shutil.which', return_value='/usr/bin/ceph')
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_native_cli(self, m_run_command, m_exit_json, m_which):
+        ca_test_common.set_module_args({
+            'options': [
+                {'who': 'osd', 'option': 'osd_memory_target', 'value': '5368709120'},
+                {'who': 'mon', 'option': 'mon_allow_pool_delete', 'action': 'remove'},
+            ],
+            'use_native_cli': True
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, fake_config_dump, ''), (0, '', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_config.main()
+
+        result = result.value.args[0]
+        assert m_run_command.call_args_list[0].args[0] == ['ceph', 'config', 'dump', '--format', 'json']
+        assert result['cmd'] == ['bash', '-c',
+                                 'ceph config set osd osd_memory_target 5368709120 && '
+                                 'ceph config rm mon mon_allow_pool_delete']
@@ -0,0 +1,197 @@
+from mock.mock import patch
+import json
+import pytest
+from ansible_collections.ceph.automation.tests.unit.modules import ca_test_common
+from ansible_collections.ceph.automation.plugins.modules import ceph_orch_apply
+
+fake_spec = '''
+service_type: nfs
+service_id: iac
+placement:
+  count: 1
+  label: nfs
+spec:
+  port: 5001
+'''
+fake_current_spec = [{
+    'service_type': 'nfs',
+    'service_id': 'iac',
+    'service_name': 'nfs.iac',
+    'placement': {'count': 1, 'label': 'nfs'},
+    'spec': {'port': 5001},
+    'status': {'running': 1, 'size': 1}
+}]
+fake_ls_cmd = ['cephadm', 'shell', 'ceph', 'orch', 'ls', 'nfs', 'nfs.iac', '--format=json']
+fake_apply_cmd = ['cephadm', 'shell', 'ceph', 'orch', 'apply', '-i', '-']
+
+
+class TestCephOrchApply(object):
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_new_service(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'spec': fake_spec
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, 'No services reported', ''), (0, 'Scheduled nfs.iac update...', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == fake_apply_cmd
+        assert m_run_command.call_args_list[0].args[0] == fake_ls_cmd
+        assert result['stdout'] == 'Scheduled nfs.iac update...'
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_unchanged_service(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'spec': fake_spec
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, json.dumps(fake_current_spec), ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert m_run_command.call_count == 1
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_changed_service(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'spec': fake_spec.replace('5001', '5002')
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, json.dumps(fake_current_spec), ''), (0, 'Scheduled nfs.iac update...', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == fake_apply_cmd
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_unchanged_host(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'spec': 'service_type: host\nhostname: ceph-node1\naddr: 10.10.10.11\nlabels:\n  - mon\nlocation:\n  rack: rack1\n'
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        current = [{'addr': '10.10.10.11', 'hostname': 'ceph-node1', 'labels': ['mon'], 'status': ''}]
+        m_run_command.return_value = 0, json.dumps(current), ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert m_run_command.call_args_list[0].args[0] == ['cephadm', 'shell', 'ceph', 'orch', 'host', 'ls',
+                                                           '--host-pattern', 'ceph-node1', '--format=json']
+
+    def test_change_required(self):
+        expected = ceph_orch_apply.parse_spec(fake_spec)
+        assert not ceph_orch_apply.change_required(dict(fake_current_spec[0]), expected)
+        assert ceph_orch_apply.change_required({}, expected)
+
+        current = dict(fake_current_spec[0], placement={'count': 1, 'label': 'nfs', 'hosts': ['ceph-node1']})
+        assert ceph_orch_apply.change_required(current, expected)
+
+        current = dict(fake_current_spec[0])
+        del current['spec']
+        assert ceph_orch_apply.change_required(current, expected)
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_dict_spec(self, m_run_command, m_exit_json):
+        spec = {
+            'service_type': 'nfs',
+            'service_id': 'iac',
+            'placement': {'count': 1, 'label': 'nfs'},
+            'spec': {'port': 5002}
+        }
+        ca_test_common.set_module_args({
+            'spec': spec
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(0, json.dumps(fake_current_spec), ''), (0, 'Scheduled nfs.iac update...', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == fake_apply_cmd
+        assert json.loads(m_run_command.call_args_list[1].kwargs['data']) == spec
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_specs(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'specs': [
+                fake_spec,
+                {'service_type': 'mds', 'service_id': 'cephfs', 'placement': {'count': 2}},
+                {'service_type': 'host', 'hostname': 'ceph-node1', 'addr': '10.10.10.11'},
+                {'service_type': 'host', 'hostname': 'ceph-node2', 'addr': '10.10.10.12'},
+            ]
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        hosts = [{'addr': '10.10.10.11', 'hostname': 'ceph-node1', 'labels': [], 'status': ''}]
+        listings = '{}\n{}\n{}\n'.format(json.dumps(fake_current_spec), ceph_orch_apply.LISTING_SEPARATOR, json.dumps(hosts))
+        m_run_command.side_effect = [(0, listings, ''), (0, 'Scheduled mds.cephfs update...', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert result['cmd'] == fake_apply_cmd
+        assert m_run_command.call_count == 2
+        assert m_run_command.call_args_list[0].args[0] == [
+            'cephadm', 'shell', 'bash', '-c',
+            "ceph orch ls --format=json && echo '{}' && ceph orch host ls --format=json".format(ceph_orch_apply.LISTING_SEPARATOR)
+        ]
+        data = m_run_command.call_args_list[1].kwargs['data'].split('\n---\n')
+        assert [json.loads(doc) for doc in data] == [
+            {'service_type': 'mds', 'service_id': 'cephfs', 'placement': {'count': 2}},
+            {'service_type': 'host', 'hostname': 'ceph-node2', 'addr': '10.10.10.12'},
+        ]
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_specs_unchanged(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'specs': [fake_spec]
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.return_value = 0, json.dumps(fake_current_spec), ''
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert not result['changed']
+        assert m_run_command.call_count == 1
+        assert m_run_command.call_args_list[0].args[0] == ['cephadm', 'shell', 'ceph', 'orch', 'ls', '--format=json']
+
+    @patch('ansible.module_utils.basic.AnsibleModule.exit_json')
+    @patch('ansible.module_utils.basic.AnsibleModule.run_command')
+    def test_apply_specs_listing_failure(self, m_run_command, m_exit_json):
+        ca_test_common.set_module_args({
+            'specs': [fake_spec, {'service_type': 'host', 'hostname': 'ceph-node1', 'addr': '10.10.10.11'}]
+        })
+        m_exit_json.side_effect = ca_test_common.exit_json
+        m_run_command.side_effect = [(1, '', 'error'), (0, 'Scheduled nfs.iac update...', '')]
+
+        with pytest.raises(ca_test_common.AnsibleExitJson) as result:
+            ceph_orch_apply.main()
+
+        result = result.value.args[0]
+        assert result['changed']
+        assert len(m_run_command.call_args_list[1].kwargs['data'].split('\n---\n')) == 2